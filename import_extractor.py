@@ -0,0 +1,196 @@
+"""Import extraction for sync_environments.py.
+
+Kept in its own fully annotated module so it can optionally be compiled to a
+C extension with mypyc (`mypyc import_extractor.py`). Python prefers the
+compiled extension over this source file when both are present, so no other
+changes are needed to use it.
+"""
+
+import ast
+import codecs
+import re
+import sys
+from bisect import bisect
+from pathlib import Path
+from typing import List, Optional, Union
+
+
+# Module-level statements whose bodies may hold guarded imports
+# (e.g. "try: import x" or "if TYPE_CHECKING: import y")
+IMPORT_GUARD_NODES = (ast.If, ast.Try, ast.With) + (
+    (ast.TryStar,) if hasattr(ast, "TryStar") else ()
+)
+
+
+# Unindented import statements; without guards these are all the module-level imports
+IMPORT_LINE_RE = re.compile(
+    rb"^(?:import[ \t]+([\w. \t,]+)|from[ \t]+([\w.]+)[ \t]+import\b)", re.MULTILINE
+)
+
+# Import lines the line scan can't handle: ';', a backslash continuation, or
+# non-ASCII bytes (bytes-mode \w only matches ASCII identifiers)
+COMPLEX_IMPORT_RE = re.compile(
+    rb"^(?:import|from)\b[^\r\n]*(?:;|[\x80-\xff]|\\[ \t]*\r?$)", re.MULTILINE
+)
+
+# Start of any unindented import line, and the delimiters of triple-quoted strings,
+# used to spot import (and guard) lines that are really inside a string
+IMPORT_START_RE = re.compile(rb"^(?:import|from)\b", re.MULTILINE)
+TRIPLE_QUOTE_RES = (re.compile(rb'"""'), re.compile(rb"'''"))
+
+# Module-level guard blocks, whose imports are indented and missed by the line scan
+GUARD_BLOCK_RE = re.compile(rb"^(?:if|try|with|async[ \t]+with)\b", re.MULTILINE)
+
+# Unindented lines that open or continue a guard block
+GUARD_LINE_RE = re.compile(
+    rb"^(?:if|elif|else|try|except|finally|with|async[ \t]+with)\b", re.MULTILINE
+)
+
+
+class PackageExtractor:
+    """Extract imported package names from the module-level statements of a file.
+
+    Function and class bodies are not searched, which keeps traversal to a
+    small fraction of the tree on large files.
+    """
+
+    def __init__(self) -> None:
+        self.imports: List[str] = []
+
+    def visit_statements(self, statements: List[ast.stmt]) -> None:
+        """Collect imports from a list of statements, descending only into guards."""
+        for node in statements:
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    # Get the top-level package name
+                    self.imports.append(alias.name.split(".")[0])
+            elif isinstance(node, ast.ImportFrom):
+                if node.module:
+                    # Get the top-level package name
+                    self.imports.append(node.module.split(".")[0])
+            elif isinstance(node, IMPORT_GUARD_NODES):
+                self.visit_statements(node.body)
+                self.visit_statements(getattr(node, "orelse", []))
+                for handler in getattr(node, "handlers", []):
+                    self.visit_statements(handler.body)
+                self.visit_statements(getattr(node, "finalbody", []))
+
+
+def scan_import_lines(source: bytes) -> List[str]:
+    """Extract imported packages by scanning unindented import lines."""
+    imports: List[str] = []
+    for match in IMPORT_LINE_RE.finditer(source):
+        if match.group(1) is not None:
+            # 'import a.b, c as d' -> ['a.b', 'c']
+            modules = [
+                name.split()[0] for name in match.group(1).split(b",") if name.strip()
+            ]
+        else:
+            modules = [match.group(2)]
+
+        for module in modules:
+            # Relative imports ('from .x import y') name the local module after the dots
+            package = module.lstrip(b".").split(b".")[0]
+            if package:
+                imports.append(package.decode("ascii"))
+    return imports
+
+
+def has_line_in_string(source: bytes, line_start_re: "re.Pattern[bytes]") -> bool:
+    """Check whether a line matched by line_start_re is in a triple-quoted string.
+
+    Counts the triple quotes of each kind before every matched line; an odd
+    count means the line is string content rather than code.
+    """
+    quote_positions = [
+        [match.start() for match in quote_re.finditer(source)]
+        for quote_re in TRIPLE_QUOTE_RES
+    ]
+    quote_positions = [positions for positions in quote_positions if positions]
+    if not quote_positions:
+        return False
+
+    for match in line_start_re.finditer(source):
+        for positions in quote_positions:
+            if bisect(positions, match.start()) % 2:
+                return True
+    return False
+
+
+def extract_guard_blocks(source: bytes) -> bytes:
+    """Cut the module-level guard blocks (and comments) out of a file's source.
+
+    Other top-level code, such as function and class bodies, is dropped. The
+    result may not be valid Python (e.g. an unindented line inside a string),
+    so callers must be prepared for it to fail to parse.
+    """
+    kept: List[bytes] = []
+    in_guard = False
+    for line in source.splitlines(keepends=True):
+        first = line[:1]
+        if first in (b" ", b"\t", b")", b"]", b"}") or not line.strip():
+            # Indented, closing-bracket or blank lines continue the current block
+            if in_guard:
+                kept.append(line)
+        elif first == b"#":
+            # Keep comments so a PEP 263 coding cookie survives
+            kept.append(line)
+        else:
+            in_guard = GUARD_LINE_RE.match(line) is not None
+            if in_guard:
+                kept.append(line)
+    return b"".join(kept)
+
+
+def extract_imports_from_ast(source: bytes, filename: str) -> List[str]:
+    """Extract imported packages from source by parsing it into a full AST."""
+    # ast.parse decodes bytes itself, honouring PEP 263 coding cookies
+    tree = ast.parse(source, filename=filename)
+
+    extractor = PackageExtractor()
+    extractor.visit_statements(tree.body)
+    return extractor.imports
+
+
+def extract_imports_from_file(file_path: Union[str, Path]) -> Optional[List[str]]:
+    """
+    Extract all imported packages from a Python file (may contain duplicates).
+
+    Returns None if the file could not be read or parsed.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            source = f.read()
+
+        # A leading BOM would stop the regexes' '^' matching the first line;
+        # ast.parse handles it itself, so only the line scan sees it stripped
+        text = source
+        if text.startswith(codecs.BOM_UTF8):
+            text = text[len(codecs.BOM_UTF8) :]
+
+        if COMPLEX_IMPORT_RE.search(text) or has_line_in_string(text, IMPORT_START_RE):
+            return extract_imports_from_ast(source, str(file_path))
+
+        # Plain top-level imports are found far more cheaply by a line scan than
+        # by building the full AST
+        imports = scan_import_lines(text)
+        if not GUARD_BLOCK_RE.search(text):
+            return imports
+
+        # Guard lines inside a string (e.g. a docstring usage example) would be
+        # cut out as code, so such files get the full parse
+        if has_line_in_string(text, GUARD_LINE_RE):
+            return extract_imports_from_ast(source, str(file_path))
+
+        # Guarded imports need the parser, but only the guard blocks themselves;
+        # if they can't be parsed in isolation, parse the whole file instead
+        try:
+            guarded = extract_imports_from_ast(
+                extract_guard_blocks(text), str(file_path)
+            )
+        except (SyntaxError, ValueError):
+            return extract_imports_from_ast(source, str(file_path))
+        return imports + guarded
+    except Exception as e:
+        print(f"Warning: Could not parse {file_path}: {e}", file=sys.stderr)
+        return None
@@ -1,11 +1,100 @@
 import argparse
-import ast
 import json
 import os
+import re
+import shutil
 import subprocess
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, Optional
+from typing import AbstractSet, Dict, List, Set, Tuple, Optional
+
+from import_extractor import extract_imports_from_file
+
+
+# Below this many files, parsing serially beats process pool startup cost
+PARALLEL_PARSE_THRESHOLD = 16
+
+# On-disk cache of extracted imports, keyed by file path and validated by mtime+size
+IMPORT_CACHE_FILE = Path(".sync_env_cache.json")
+# Bump whenever import extraction changes so stale cache entries are discarded
+IMPORT_CACHE_VERSION = 7
+
+# Directories never worth descending into when looking for Python files
+SKIP_DIRS = {"__pycache__", "node_modules", "venv"}
+
+# Serializes output from the conda/venv queries, which run concurrently
+PRINT_LOCK = threading.Lock()
+
+
+# Resolved Python executables for conda environments, keyed by env name
+CONDA_PYTHON_CACHE: Dict[str, Path] = {}
+
+
+# Common stdlib modules for Python < 3.10 (not exhaustive, but covers most cases)
+FALLBACK_STDLIB_MODULES = {
+    "abc",
+    "argparse",
+    "ast",
+    "asyncio",
+    "base64",
+    "collections",
+    "contextlib",
+    "copy",
+    "csv",
+    "datetime",
+    "decimal",
+    "functools",
+    "glob",
+    "hashlib",
+    "html",
+    "io",
+    "itertools",
+    "json",
+    "logging",
+    "math",
+    "multiprocessing",
+    "os",
+    "pathlib",
+    "pickle",
+    "re",
+    "signal",
+    "statistics",
+    "string",
+    "subprocess",
+    "sys",
+    "tempfile",
+    "threading",
+    "time",
+    "typing",
+    "unittest",
+    "urllib",
+    "warnings",
+    "weakref",
+    "xml",
+    "__future__",
+    "dataclasses",
+    "enum",
+}
+
+# Complete set of stdlib top-level module names on Python 3.10+
+STDLIB_MODULES = getattr(sys, "stdlib_module_names", None) or FALLBACK_STDLIB_MODULES
+
+
+# Lists installed distributions as JSON in the same shape as 'pip list --format=json',
+# using only the stdlib so the target interpreter doesn't have to import pip
+PACKAGE_LIST_SNIPPET = """
+import json, importlib.metadata as m
+packages = {}
+for dist in m.distributions():
+    name = dist.metadata["Name"]
+    if name:
+        packages.setdefault(name, dist.version)
+print(json.dumps([{"name": n, "version": v} for n, v in packages.items()]))
+"""
 
 
 # Mapping from import names to package names (for cases where they differ)
@@ -19,47 +108,85 @@ IMPORT_TO_PACKAGE = {
     "lightning": "pytorch-lightning",
 }
 
+# Install order heuristic for the sync script: packages whose names contain one of
+# these are installed first (critical) or second (secondary)
+CRITICAL_PACKAGES = ["numpy", "torch", "pytorch"]
+SECONDARY_PACKAGES = ["pytorch-lightning", "lightning", "transformers"]
+CRITICAL_PACKAGES_RE = re.compile("|".join(map(re.escape, CRITICAL_PACKAGES)))
+SECONDARY_PACKAGES_RE = re.compile("|".join(map(re.escape, SECONDARY_PACKAGES)))
 
-class PackageExtractor(ast.NodeVisitor):
-    """AST visitor to extract imported package names from Python files."""
 
-    def __init__(self):
-        self.imports: Set[str] = set()
+def iter_python_files(root: str):
+    """Yield paths of Python files under root, skipping hidden and junk directories."""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        if (
+                            not entry.name.startswith(".")
+                            and entry.name not in SKIP_DIRS
+                        ):
+                            stack.append(entry.path)
+                    elif entry.name.endswith(".py"):
+                        yield entry.path
+        except OSError as e:
+            print(
+                f"Warning: Could not read directory {directory}: {e}", file=sys.stderr
+            )
+
 
-    def visit_Import(self, node):
-        """Extract package names from 'import x' statements."""
-        for alias in node.names:
-            # Get the top-level package name
-            package = alias.name.split(".")[0]
-            self.imports.add(package)
-        self.generic_visit(node)
+def parse_files(python_files: List[str]) -> List[Optional[List[str]]]:
+    """Extract imports from each file, in parallel when there are many files."""
+    # Parsing is CPU-bound, so spread it across processes for large codebases
+    if len(python_files) < PARALLEL_PARSE_THRESHOLD:
+        return [extract_imports_from_file(py_file) for py_file in python_files]
 
-    def visit_ImportFrom(self, node):
-        """Extract package names from 'from x import y' statements."""
-        if node.module:
-            # Get the top-level package name
-            package = node.module.split(".")[0]
-            self.imports.add(package)
-        self.generic_visit(node)
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        return list(executor.map(extract_imports_from_file, python_files, chunksize=32))
 
 
-def extract_imports_from_file(file_path: Path) -> Set[str]:
-    """Extract all imported packages from a Python file."""
+def load_import_cache(cache_file: Path) -> Dict[str, dict]:
+    """Load the import cache from disk, returning an empty cache if unusable."""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            tree = ast.parse(f.read(), filename=str(file_path))
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(cache, dict) or cache.get("version") != IMPORT_CACHE_VERSION:
+        return {}
 
-        extractor = PackageExtractor()
-        extractor.visit(tree)
-        return extractor.imports
-    except Exception as e:
-        print(f"Warning: Could not parse {file_path}: {e}", file=sys.stderr)
-        return set()
+    files = cache.get("files")
+    if not isinstance(files, dict):
+        return {}
+
+    # Skip malformed entries; those files are simply parsed again
+    return {
+        path: entry
+        for path, entry in files.items()
+        if isinstance(entry, dict) and isinstance(entry.get("imports"), list)
+    }
 
 
-def scan_codebase(paths: List[Path]) -> Set[str]:
+def save_import_cache(cache_file: Path, cache: Dict[str, dict]):
+    """Write the import cache to disk (failures are non-fatal)."""
+    try:
+        with open(cache_file, "w", encoding="utf-8") as f:
+            json.dump({"version": IMPORT_CACHE_VERSION, "files": cache}, f)
+    except OSError as e:
+        print(
+            f"Warning: Could not write import cache {cache_file}: {e}", file=sys.stderr
+        )
+
+
+def scan_codebase(paths: List[Path], cache_file: Path = IMPORT_CACHE_FILE) -> Set[str]:
     """Scan Python files in given paths to extract all imported packages."""
-    all_imports = set()
+    # Per-file import lists, deduplicated once at the end
+    import_lists = []
+    all_python_files = []
 
     for base_path in paths:
         if not base_path.exists():
@@ -68,71 +195,74 @@ def scan_codebase(paths: List[Path]) -> Set[str]:
 
         # Find all Python files
         if base_path.is_file():
-            python_files = [base_path]
+            python_files = [str(base_path)]
         else:
-            python_files = list(base_path.rglob("*.py"))
+            python_files = list(iter_python_files(str(base_path)))
 
         print(f"Scanning {len(python_files)} Python files in {base_path}...")
+        all_python_files.extend(python_files)
 
-        for py_file in python_files:
-            imports = extract_imports_from_file(py_file)
-            all_imports.update(imports)
+    # Reuse cached imports for files whose mtime and size are unchanged. Only
+    # entries for the files scanned now are written back, so the cache doesn't
+    # keep deleted files or old scan paths around
+    cache = load_import_cache(cache_file)
+    new_cache = {}
+    stale_files = []
+    stale_stats: List[Optional[os.stat_result]] = []
 
-    return all_imports
+    for py_file in all_python_files:
+        try:
+            st = os.stat(py_file)
+        except OSError:
+            stale_files.append(py_file)
+            stale_stats.append(None)
+            continue
 
+        entry = cache.get(py_file)
+        if (
+            entry
+            and entry.get("mtime") == st.st_mtime_ns
+            and entry.get("size") == st.st_size
+        ):
+            import_lists.append(entry["imports"])
+            new_cache[py_file] = entry
+        else:
+            stale_files.append(py_file)
+            stale_stats.append(st)
+
+    if all_python_files:
+        print(
+            f"Using cached imports for {len(all_python_files) - len(stale_files)} files, "
+            f"parsing {len(stale_files)}"
+        )
+
+    parsed = zip(stale_files, stale_stats, parse_files(stale_files))
+    for py_file, stale_st, imports in parsed:
+        # Failures aren't cached, so they are retried (and warned about) next run
+        if imports is None:
+            continue
+
+        import_lists.append(imports)
+        if stale_st is not None:
+            new_cache[py_file] = {
+                "mtime": stale_st.st_mtime_ns,
+                "size": stale_st.st_size,
+                "imports": sorted(set(imports)),
+            }
+
+    save_import_cache(cache_file, new_cache)
+
+    return set(chain.from_iterable(import_lists))
 
-def filter_stdlib_and_local(imports: Set[str], local_packages: Set[str]) -> Set[str]:
-    """Filter out standard library and local packages, keeping only external ones."""
-    # Common stdlib modules (not exhaustive, but covers most cases)
-    stdlib_modules = {
-        "abc",
-        "argparse",
-        "ast",
-        "asyncio",
-        "base64",
-        "collections",
-        "contextlib",
-        "copy",
-        "csv",
-        "datetime",
-        "decimal",
-        "functools",
-        "glob",
-        "hashlib",
-        "html",
-        "io",
-        "itertools",
-        "json",
-        "logging",
-        "math",
-        "multiprocessing",
-        "os",
-        "pathlib",
-        "pickle",
-        "re",
-        "signal",
-        "statistics",
-        "string",
-        "subprocess",
-        "sys",
-        "tempfile",
-        "threading",
-        "time",
-        "typing",
-        "unittest",
-        "urllib",
-        "warnings",
-        "weakref",
-        "xml",
-        "__future__",
-        "dataclasses",
-        "enum",
-    }
 
+def filter_stdlib_and_local(
+    imports: Set[str], local_packages: AbstractSet[str]
+) -> Set[str]:
+    """Filter out standard library and local packages, keeping only external ones."""
     return {
         imp
         for imp in imports
-        if imp not in stdlib_modules and imp not in local_packages
+        if imp not in STDLIB_MODULES and imp not in local_packages
     }
 
 
@@ -141,53 +271,134 @@ def normalize_package_name(import_name: str) -> str:
     return IMPORT_TO_PACKAGE.get(import_name, import_name)
 
 
+def find_conda_env_python(conda_env: str) -> Path:
+    """Locate the Python executable of a conda environment by name."""
+    if conda_env in CONDA_PYTHON_CACHE:
+        return CONDA_PYTHON_CACHE[conda_env]
+
+    try:
+        result = subprocess.run(
+            ["conda", "info", "--json"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        info = json.loads(result.stdout)
+    except subprocess.CalledProcessError as e:
+        with PRINT_LOCK:
+            print("Error: Could not run 'conda info'", file=sys.stderr)
+            print(f"Error details: {e.stderr}", file=sys.stderr)
+        sys.exit(1)
+    except json.JSONDecodeError as e:
+        with PRINT_LOCK:
+            print("Error: Could not parse 'conda info' output", file=sys.stderr)
+        sys.exit(1)
+
+    # The base environment lives at the conda root rather than under envs/
+    env_prefix = None
+    if conda_env == "base" and info.get("root_prefix"):
+        env_prefix = Path(info["root_prefix"])
+    else:
+        for env in info.get("envs", []):
+            if Path(env).name == conda_env:
+                env_prefix = Path(env)
+                break
+
+    if env_prefix is None:
+        with PRINT_LOCK:
+            print(f"Error: Conda environment '{conda_env}' not found", file=sys.stderr)
+            print("\nHint: Run 'conda env list' to see environments", file=sys.stderr)
+        sys.exit(1)
+
+    # Conda puts python.exe at the env root on Windows, unlike venvs
+    if sys.platform == "win32":
+        python_exe = env_prefix / "python.exe"
+    else:
+        python_exe = env_prefix / "bin" / "python"
+
+    CONDA_PYTHON_CACHE[conda_env] = python_exe
+    return python_exe
+
+
+def canonical_package_name(name: str) -> str:
+    """Normalize a package name so case and '-'/'_' variations compare equal."""
+    return name.lower().replace("_", "-")
+
+
 def get_conda_packages(conda_env: str) -> Dict[str, str]:
     """Get package versions from conda environment using the actual Python interpreter."""
-    print(f"\nQuerying conda environment '{conda_env}'...")
+    with PRINT_LOCK:
+        print(f"\nQuerying conda environment '{conda_env}'...")
+
+    python_exe = find_conda_env_python(conda_env)
+
+    if not python_exe.exists():
+        with PRINT_LOCK:
+            print(
+                f"Error: Could not find Python executable in conda environment "
+                f"'{conda_env}' at {python_exe}",
+                file=sys.stderr,
+            )
+            print(
+                "\nHint: Make sure the conda environment has Python 3.8+ installed:",
+                file=sys.stderr,
+            )
+            print(f"  conda install -n {conda_env} python", file=sys.stderr)
+        sys.exit(1)
 
     try:
         # Use the actual Python from the conda env to get accurate package versions
         # This is more reliable than 'conda list' which can be stale or miss pip-installed packages
+        # Calling it directly also avoids the activation overhead of 'conda run'
         result = subprocess.run(
-            [
-                "conda",
-                "run",
-                "-n",
-                conda_env,
-                "python",
-                "-m",
-                "pip",
-                "list",
-                "--format=json",
-            ],
+            [str(python_exe), "-c", PACKAGE_LIST_SNIPPET],
             capture_output=True,
             text=True,
             check=True,
         )
 
         packages = json.loads(result.stdout)
-        return {pkg["name"].lower(): pkg["version"] for pkg in packages}
+        return {canonical_package_name(pkg["name"]): pkg["version"] for pkg in packages}
 
     except subprocess.CalledProcessError as e:
-        print(
-            f"Error: Could not query conda environment '{conda_env}'", file=sys.stderr
-        )
-        print(f"Error details: {e.stderr}", file=sys.stderr)
-        print(
-            "\nHint: Make sure the conda environment has pip installed:",
-            file=sys.stderr,
-        )
-        print(f"  conda install -n {conda_env} pip", file=sys.stderr)
+        with PRINT_LOCK:
+            print(
+                f"Error: Could not query conda environment '{conda_env}'",
+                file=sys.stderr,
+            )
+            print(f"Error details: {e.stderr}", file=sys.stderr)
+            print(
+                "\nHint: Make sure the conda environment has Python 3.8+ installed:",
+                file=sys.stderr,
+            )
+            print(f"  conda install -n {conda_env} python", file=sys.stderr)
         sys.exit(1)
     except json.JSONDecodeError as e:
-        print(f"Error: Could not parse pip output from conda env", file=sys.stderr)
+        with PRINT_LOCK:
+            print("Error: Could not parse package list from conda env", file=sys.stderr)
         sys.exit(1)
 
 
+def is_uv_available() -> bool:
+    """Check whether a working uv executable is on PATH."""
+    # A PATH lookup is far cheaper than spawning uv, so rule it out first
+    if shutil.which("uv") is None:
+        return False
+
+    try:
+        subprocess.run(["uv", "--version"], capture_output=True, check=True)
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+
+@lru_cache(maxsize=None)
 def detect_package_manager(prefer: str = "auto") -> str:
     """
     Detect which package manager to use (uv or pip).
 
+    The result is cached, so uv is probed at most once per process.
+
     Args:
         prefer: 'auto', 'uv', or 'pip'
 
@@ -199,31 +410,28 @@ def detect_package_manager(prefer: str = "auto") -> str:
 
     if prefer == "uv":
         # Verify uv is available
-        try:
-            subprocess.run(["uv", "--version"], capture_output=True, check=True)
+        if is_uv_available():
             return "uv"
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        with PRINT_LOCK:
             print(
                 "Warning: uv requested but not found, falling back to pip",
                 file=sys.stderr,
             )
-            return "pip"
+        return "pip"
 
     # Auto-detect: try uv first
-    try:
-        subprocess.run(["uv", "--version"], capture_output=True, check=True)
-        return "uv"
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return "pip"
+    return "uv" if is_uv_available() else "pip"
 
 
 def get_venv_packages(venv_path: Path, package_manager: str = "auto") -> Dict[str, str]:
     """Get package versions from Python venv using uv or pip."""
-    print(f"\nQuerying venv at '{venv_path}'...")
+    with PRINT_LOCK:
+        print(f"\nQuerying venv at '{venv_path}'...")
 
     # Detect package manager
     pm = detect_package_manager(package_manager)
-    print(f"Using package manager: {pm}")
+    with PRINT_LOCK:
+        print(f"Using package manager: {pm}")
 
     # Find the python executable in the venv
     if sys.platform == "win32":
@@ -232,10 +440,11 @@ def get_venv_packages(venv_path: Path, package_manager: str = "auto") -> Dict[st
         python_exe = venv_path / "bin" / "python"
 
     if not python_exe.exists():
-        print(
-            f"Error: Could not find Python executable in venv at {venv_path}",
-            file=sys.stderr,
-        )
+        with PRINT_LOCK:
+            print(
+                f"Error: Could not find Python executable in venv at {venv_path}",
+                file=sys.stderr,
+            )
         sys.exit(1)
 
     try:
@@ -249,80 +458,58 @@ def get_venv_packages(venv_path: Path, package_manager: str = "auto") -> Dict[st
                 env={**os.environ, "VIRTUAL_ENV": str(venv_path.absolute())},
             )
         else:
-            # Use pip list
+            # List installed distributions with importlib.metadata, which starts
+            # much faster than pip
             result = subprocess.run(
-                [str(python_exe), "-m", "pip", "list", "--format=json"],
+                [str(python_exe), "-c", PACKAGE_LIST_SNIPPET],
                 capture_output=True,
                 text=True,
                 check=True,
             )
 
         packages = json.loads(result.stdout)
-        return {pkg["name"].lower(): pkg["version"] for pkg in packages}
+        return {canonical_package_name(pkg["name"]): pkg["version"] for pkg in packages}
 
     except subprocess.CalledProcessError as e:
-        print(f"Error: Could not query venv packages with {pm}", file=sys.stderr)
-        print(f"Error details: {e.stderr}", file=sys.stderr)
+        with PRINT_LOCK:
+            print(f"Error: Could not query venv packages with {pm}", file=sys.stderr)
+            print(f"Error details: {e.stderr}", file=sys.stderr)
 
-        # If uv failed, suggest trying pip
-        if pm == "uv":
-            print("\nHint: Try running with --package-manager pip", file=sys.stderr)
+            # If uv failed, suggest trying pip
+            if pm == "uv":
+                print("\nHint: Try running with --package-manager pip", file=sys.stderr)
 
         sys.exit(1)
     except json.JSONDecodeError as e:
-        print(f"Error: Could not parse {pm} output", file=sys.stderr)
+        with PRINT_LOCK:
+            print(f"Error: Could not parse {pm} output", file=sys.stderr)
         sys.exit(1)
 
 
 def find_package_in_list(
     package: str, package_dict: Dict[str, str]
 ) -> Optional[Tuple[str, str]]:
-    """Find a package in the package dictionary, handling case and naming variations."""
-    # Direct match
-    if package in package_dict:
-        return (package, package_dict[package])
-
-    # Case-insensitive match
-    package_lower = package.lower()
-    if package_lower in package_dict:
-        return (package_lower, package_dict[package_lower])
-
-    # Try with underscores instead of hyphens
-    package_underscore = package.replace("-", "_")
-    if package_underscore in package_dict:
-        return (package_underscore, package_dict[package_underscore])
-
-    package_underscore_lower = package_underscore.lower()
-    if package_underscore_lower in package_dict:
-        return (package_underscore_lower, package_dict[package_underscore_lower])
-
-    # Try with hyphens instead of underscores
-    package_hyphen = package.replace("_", "-")
-    if package_hyphen in package_dict:
-        return (package_hyphen, package_dict[package_hyphen])
-
-    package_hyphen_lower = package_hyphen.lower()
-    if package_hyphen_lower in package_dict:
-        return (package_hyphen_lower, package_dict[package_hyphen_lower])
-
-    return None
+    """Find a package in a canonically keyed package dictionary."""
+    key = canonical_package_name(package)
+    version = package_dict.get(key)
+    return None if version is None else (key, version)
 
 
 def compare_versions(
     required_packages: Set[str],
     conda_packages: Dict[str, str],
     venv_packages: Dict[str, str],
-) -> Tuple[Dict[str, Tuple[str, str]], Set[str], Set[str]]:
+) -> Tuple[Dict[str, Tuple[str, str]], Dict[str, str], Set[str]]:
     """
     Compare package versions between conda and venv.
 
     Returns:
         - mismatches: {package: (conda_version, venv_version)}
-        - missing_in_venv: packages in conda but not in venv
+        - missing_in_venv: {package: conda_version} for packages not in venv
         - not_in_conda: packages used but not in conda
     """
     mismatches = {}
-    missing_in_venv = set()
+    missing_in_venv = {}
     not_in_conda = set()
 
     for package in required_packages:
@@ -342,7 +529,7 @@ def compare_versions(
         venv_result = find_package_in_list(package_name, venv_packages)
 
         if venv_result is None:
-            missing_in_venv.add(package_name)
+            missing_in_venv[package_name] = conda_version
             continue
 
         venv_name, venv_version = venv_result
@@ -356,7 +543,7 @@ def compare_versions(
 
 def print_report(
     mismatches: Dict[str, Tuple[str, str]],
-    missing_in_venv: Set[str],
+    missing_in_venv: Dict[str, str],
     not_in_conda: Set[str],
     conda_packages: Dict[str, str],
     venv_packages: Dict[str, str],
@@ -379,10 +566,7 @@ def print_report(
     if missing_in_venv:
         print(f"\n⚠️  MISSING IN VENV ({len(missing_in_venv)} packages):")
         print("-" * 80)
-        for package in sorted(missing_in_venv):
-            # Find the version in conda
-            conda_result = find_package_in_list(package, conda_packages)
-            version = conda_result[1] if conda_result else "unknown"
+        for package, version in sorted(missing_in_venv.items()):
             print(f"  - {package:<30} (conda version: {version})")
 
     if not_in_conda:
@@ -407,38 +591,40 @@ def print_report(
 
 
 def generate_requirements(
-    required_packages: Set[str], conda_packages: Dict[str, str], output_file: Path
+    required_packages: Set[str],
+    conda_packages: Dict[str, str],
+    output_file: Path,
 ):
     """Generate a requirements.txt file with pinned versions from conda."""
     print(f"\nGenerating requirements file: {output_file}")
 
-    requirements = []
-
-    for package in sorted(required_packages):
-        package_name = normalize_package_name(package)
-        conda_result = find_package_in_list(package_name, conda_packages)
+    package_names = sorted(
+        map(normalize_package_name, required_packages), key=canonical_package_name
+    )
+    versions = [conda_packages.get(canonical_package_name(p)) for p in package_names]
 
-        if conda_result:
-            name, version = conda_result
-            requirements.append(f"{package_name}=={version}")
-        else:
+    for package_name, version in zip(package_names, versions):
+        if version is None:
             print(
                 f"Warning: {package_name} not found in conda, adding without version pin"
             )
-            requirements.append(package_name)
 
-    with open(output_file, "w") as f:
-        f.write("# Auto-generated requirements from conda environment\n")
-        f.write("# Generated by sync_environments.py\n\n")
-        f.write("\n".join(requirements))
+    requirements = [
+        package_name if version is None else f"{package_name}=={version}"
+        for package_name, version in zip(package_names, versions)
+    ]
+
+    output_file.write_text(
+        "# Auto-generated requirements from conda environment\n"
+        "# Generated by sync_environments.py\n\n" + "\n".join(requirements) + "\n"
+    )
 
     print(f"✅ Requirements file generated: {output_file}")
 
 
 def generate_sync_script(
     mismatches: Dict[str, Tuple[str, str]],
-    missing_in_venv: Set[str],
-    conda_packages: Dict[str, str],
+    missing_in_venv: Dict[str, str],
     output_file: Path,
     venv_path: Path,
     package_manager: str = "auto",
@@ -453,80 +639,79 @@ def generate_sync_script(
     # Packages to install/upgrade
     packages_to_sync = []
 
-    for package in sorted(missing_in_venv):
-        conda_result = find_package_in_list(package, conda_packages)
-        if conda_result:
-            name, version = conda_result
-            packages_to_sync.append((package, version, "missing"))
+    for package, version in sorted(missing_in_venv.items()):
+        packages_to_sync.append((package, version, "missing"))
 
     for package, (conda_ver, venv_ver) in sorted(mismatches.items()):
         packages_to_sync.append((package, conda_ver, "mismatch"))
 
-    with open(output_file, "w") as f:
-        f.write("#!/bin/bash\n")
-        f.write("# Auto-generated script to synchronize venv with conda environment\n")
-        f.write(f"# Generated by sync_environments.py\n")
-        f.write(f"# Package manager: {pm}\n\n")
-        f.write("set -e  # Exit on error\n\n")
+    # Build the whole script in memory and write it with a single call
+    parts = []
+    parts.append("#!/bin/bash\n")
+    parts.append("# Auto-generated script to synchronize venv with conda environment\n")
+    parts.append(f"# Generated by sync_environments.py\n")
+    parts.append(f"# Package manager: {pm}\n\n")
+    parts.append("set -e  # Exit on error\n\n")
 
-        if not packages_to_sync:
-            f.write("echo 'No packages to sync!'\n")
+    if not packages_to_sync:
+        parts.append("echo 'No packages to sync!'\n")
+    else:
+        # Setup based on package manager
+        if pm == "uv":
+            parts.append(f'VENV_PATH="{venv_path.absolute()}"\n')
+            parts.append('export VIRTUAL_ENV="$VENV_PATH"\n\n')
+            parts.append("# Using UV for fast package installation\n")
+            install_cmd = "uv pip install"
         else:
-            # Setup based on package manager
-            if pm == "uv":
-                f.write(f'VENV_PATH="{venv_path.absolute()}"\n')
-                f.write('export VIRTUAL_ENV="$VENV_PATH"\n\n')
-                f.write("# Using UV for fast package installation\n")
-                install_cmd = "uv pip install"
+            # Determine pip path
+            if sys.platform == "win32":
+                pip_path = venv_path / "Scripts" / "pip.exe"
             else:
-                # Determine pip path
-                if sys.platform == "win32":
-                    pip_path = venv_path / "Scripts" / "pip.exe"
-                else:
-                    pip_path = venv_path / "bin" / "pip"
-                f.write(f'VENV_PIP="{pip_path}"\n\n')
-                install_cmd = '"$VENV_PIP" install'
-
-            f.write("echo 'Starting environment synchronization...'\n")
-            f.write(f"echo 'Total packages to sync: {len(packages_to_sync)}'\n\n")
-
-            # Group by dependency order (basic heuristic)
-            # Install critical packages first
-            critical_packages = ["numpy", "torch", "pytorch"]
-            secondary_packages = ["pytorch-lightning", "lightning", "transformers"]
-
-            for priority_group, priority_name in [
-                (critical_packages, "critical dependencies"),
-                (secondary_packages, "secondary dependencies"),
-                (None, "remaining packages"),
-            ]:
-                group_packages = []
-
-                for package, version, reason in packages_to_sync:
-                    if priority_group is None:
-                        # Remaining packages
-                        if not any(
-                            p in package.lower()
-                            for p in critical_packages + secondary_packages
-                        ):
-                            group_packages.append((package, version, reason))
-                    else:
-                        # Priority packages
-                        if any(p in package.lower() for p in priority_group):
-                            group_packages.append((package, version, reason))
-
-                if group_packages:
-                    f.write(
-                        f"\necho '\\n--- Installing {priority_name} ({len(group_packages)} packages) ---'\n"
-                    )
-                    for package, version, reason in group_packages:
-                        f.write(f"\necho 'Syncing {package}=={version} ({reason})'\n")
-                        f.write(f'{install_cmd} "{package}=={version}"\n')
-
-            f.write("\necho '\\n✅ Synchronization complete!'\n")
-            f.write(
-                'echo "Run this script\'s verification: python -c "import pkg_resources; print(\'Success!\')""\n'
-            )
+                pip_path = venv_path / "bin" / "pip"
+            parts.append(f'VENV_PIP="{pip_path}"\n\n')
+            install_cmd = '"$VENV_PIP" install'
+
+        parts.append("echo 'Starting environment synchronization...'\n")
+        parts.append(f"echo 'Total packages to sync: {len(packages_to_sync)}'\n\n")
+
+        # Group by dependency order (basic heuristic), in a single pass.
+        # Secondary is checked first so e.g. 'pytorch-lightning' isn't
+        # treated as critical for containing 'torch'
+        groups: Dict[str, List[Tuple[str, str, str]]] = {
+            "critical": [],
+            "secondary": [],
+            "remaining": [],
+        }
+        for package, version, reason in packages_to_sync:
+            package_lower = package.lower()
+            if SECONDARY_PACKAGES_RE.search(package_lower):
+                group = "secondary"
+            elif CRITICAL_PACKAGES_RE.search(package_lower):
+                group = "critical"
+            else:
+                group = "remaining"
+            groups[group].append((package, version, reason))
+
+        for group, priority_name in [
+            ("critical", "critical dependencies"),
+            ("secondary", "secondary dependencies"),
+            ("remaining", "remaining packages"),
+        ]:
+            group_packages = groups[group]
+            if group_packages:
+                parts.append(
+                    f"\necho '\\n--- Installing {priority_name} ({len(group_packages)} packages) ---'\n"
+                )
+                for package, version, reason in group_packages:
+                    parts.append(f"\necho 'Syncing {package}=={version} ({reason})'\n")
+                    parts.append(f'{install_cmd} "{package}=={version}"\n')
+
+        parts.append("\necho '\\n✅ Synchronization complete!'\n")
+        parts.append(
+            'echo "Run this script\'s verification: python -c "import pkg_resources; print(\'Success!\')""\n'
+        )
+
+    output_file.write_text("".join(parts))
 
     # Make script executable on Unix-like systems
     if sys.platform != "win32":
@@ -604,18 +789,24 @@ def main():
     print(f"Found {len(all_imports)} total imports")
 
     # Step 2: Filter out stdlib and local packages
-    external_packages = filter_stdlib_and_local(all_imports, set(args.local_packages))
+    external_packages = filter_stdlib_and_local(
+        all_imports, frozenset(args.local_packages)
+    )
     print(f"Filtered to {len(external_packages)} external packages")
 
-    # Step 3: Get package versions from conda
+    # Steps 3-4: Get package versions from conda and venv
     print("\n" + "=" * 80)
     print("STEP 2: Extracting package versions")
     print("=" * 80)
-    conda_packages = get_conda_packages(args.conda_env)
+    # Both queries mostly wait on a subprocess, so run them concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        conda_future = executor.submit(get_conda_packages, args.conda_env)
+        venv_future = executor.submit(
+            get_venv_packages, args.venv_path, args.package_manager
+        )
+        conda_packages = conda_future.result()
+        venv_packages = venv_future.result()
     print(f"Found {len(conda_packages)} packages in conda environment")
-
-    # Step 4: Get package versions from venv
-    venv_packages = get_venv_packages(args.venv_path, args.package_manager)
     print(f"Found {len(venv_packages)} packages in venv")
 
     # Step 5: Compare versions
@@ -643,7 +834,6 @@ def main():
         generate_sync_script(
             mismatches,
             missing_in_venv,
-            conda_packages,
             args.output_sync_script,
             args.venv_path,
             args.package_manager,
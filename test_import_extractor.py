@@ -0,0 +1,99 @@
+"""Check the fast import extraction paths against a full ast.parse."""
+
+import ast
+from pathlib import Path
+
+import pytest
+
+from import_extractor import (
+    extract_guard_blocks,
+    extract_imports_from_ast,
+    extract_imports_from_file,
+)
+
+CASES = {
+    "plain": (
+        b"import a.b, c as d\nfrom e.f import g\nimport h  # comment\n",
+        {"a", "c", "e", "h"},
+    ),
+    "guarded": (
+        b"import os\n"
+        b"try:\n    import yaml\nexcept ImportError:\n    import json\n"
+        b"else:\n    import toml\nfinally:\n    import sys\n"
+        b"if TYPE_CHECKING:\n    from numpy import ndarray\n"
+        b"with suppress(ImportError):\n    import torch\n"
+        b"def f():\n    import skipped\n",
+        {"os", "yaml", "json", "toml", "sys", "numpy", "torch"},
+    ),
+    "semicolon": (b"import a; import b\nimport c\n", {"a", "b", "c"}),
+    "backslash": (b"import a, \\\n    b\nimport c\n", {"a", "b", "c"}),
+    "relative": (
+        b"from . import x\nfrom .pkg import y\nfrom ..up.mod import z\nimport a\n",
+        {"pkg", "up", "a"},
+    ),
+    "bom": (b"\xef\xbb\xbfimport numpy\nimport pandas\n", {"numpy", "pandas"}),
+    "bom_guard": (
+        b"\xef\xbb\xbftry:\n    import yaml\nexcept ImportError:\n    pass\nimport os\n",
+        {"yaml", "os"},
+    ),
+    "non_ascii": ("import café\nimport os\n".encode("utf-8"), {"café", "os"}),
+    "coding_cookie": (
+        "# -*- coding: latin-1 -*-\nimport os\ntry:\n    import é\nexcept:\n"
+        "    pass\n".encode("latin-1"),
+        {"os", "é"},
+    ),
+    "import_in_string": (
+        b'import os\nDOC = """\nimport not_a_dependency\n"""\n',
+        {"os"},
+    ),
+    "guard_in_module_docstring": (
+        b'"""Example:\n\ntry:\n    import foo\nexcept ImportError:\n    pass\n"""\n'
+        b"import os\n",
+        {"os"},
+    ),
+    "guard_in_function_docstring": (
+        b'import os\n\n\ndef f():\n    """Usage:\n\nif x:\n    import bar\n"""\n',
+        {"os"},
+    ),
+    # The unindented string lines cut the guard block short, so the fast path
+    # must fall back to parsing the whole file
+    "unindented_string_in_guard": (
+        b'try:\n    import yaml\n    DOC = """\nnot indented\n"""\n'
+        b"except ImportError:\n    import json\n",
+        {"yaml", "json"},
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_matches_full_parse(tmp_path, name):
+    source, expected = CASES[name]
+    path = tmp_path / f"{name}.py"
+    path.write_bytes(source)
+
+    imports = extract_imports_from_file(path)
+
+    assert imports is not None
+    assert set(imports) == expected
+    assert set(imports) == set(extract_imports_from_ast(source, str(path)))
+
+
+def test_unindented_string_guard_needs_fallback():
+    source, _ = CASES["unindented_string_in_guard"]
+    with pytest.raises(SyntaxError):
+        ast.parse(extract_guard_blocks(source))
+
+
+def test_parse_failure_returns_none(tmp_path):
+    path = tmp_path / "broken.py"
+    path.write_bytes(b"try:\n    import x\n")
+
+    assert extract_imports_from_file(path) is None
+
+
+def test_current_repo_matches_full_parse():
+    for path in Path(__file__).parent.glob("*.py"):
+        source = path.read_bytes()
+        assert set(extract_imports_from_file(path)) == set(
+            extract_imports_from_ast(source, str(path))
+        ), path
@@ -0,0 +1,89 @@
+"""Check the mtime/size import cache used by scan_codebase."""
+
+import json
+import os
+
+import pytest
+
+from sync_environments import IMPORT_CACHE_VERSION, scan_codebase
+
+
+@pytest.fixture
+def src(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "a.py").write_text("import numpy\n")
+    (src / "b.py").write_text("import pandas\n")
+    return src
+
+
+def read_cache(cache_file):
+    return json.loads(cache_file.read_text())["files"]
+
+
+def test_unchanged_rerun_hits_cache(tmp_path, src, capsys):
+    cache_file = tmp_path / "cache.json"
+
+    assert scan_codebase([src], cache_file) == {"numpy", "pandas"}
+    assert "Using cached imports for 0 files, parsing 2" in capsys.readouterr().out
+
+    assert scan_codebase([src], cache_file) == {"numpy", "pandas"}
+    assert "Using cached imports for 2 files, parsing 0" in capsys.readouterr().out
+
+
+def test_mtime_or_size_change_misses_cache(tmp_path, src, capsys):
+    cache_file = tmp_path / "cache.json"
+    scan_codebase([src], cache_file)
+
+    # Same size, new mtime
+    a = src / "a.py"
+    st = a.stat()
+    a.write_text("import scipy\n")
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    # New size
+    (src / "b.py").write_text("import pandas\nimport torch\n")
+    capsys.readouterr()
+
+    assert scan_codebase([src], cache_file) == {"scipy", "pandas", "torch"}
+    assert "Using cached imports for 0 files, parsing 2" in capsys.readouterr().out
+    assert read_cache(cache_file)[str(a)]["imports"] == ["scipy"]
+
+
+def test_parse_failure_not_cached(tmp_path, src):
+    cache_file = tmp_path / "cache.json"
+    broken = src / "broken.py"
+    broken.write_text("try:\n    import x\n")
+
+    assert scan_codebase([src], cache_file) == {"numpy", "pandas"}
+    assert str(broken) not in read_cache(cache_file)
+    assert str(src / "a.py") in read_cache(cache_file)
+
+
+def test_unscanned_files_dropped(tmp_path, src):
+    cache_file = tmp_path / "cache.json"
+    scan_codebase([src], cache_file)
+
+    (src / "b.py").unlink()
+    scan_codebase([src], cache_file)
+
+    assert set(read_cache(cache_file)) == {str(src / "a.py")}
+
+
+@pytest.mark.parametrize(
+    "entry", ["not a dict", {"mtime": 0, "size": 0, "imports": "numpy"}]
+)
+def test_malformed_cache_entry_is_reparsed(tmp_path, src, entry):
+    cache_file = tmp_path / "cache.json"
+    files = {str(src / "a.py"): entry}
+    cache_file.write_text(json.dumps({"version": IMPORT_CACHE_VERSION, "files": files}))
+
+    assert scan_codebase([src], cache_file) == {"numpy", "pandas"}
+    assert read_cache(cache_file)[str(src / "a.py")]["imports"] == ["numpy"]
+
+
+def test_files_not_a_dict_is_ignored(tmp_path, src):
+    cache_file = tmp_path / "cache.json"
+    cache_file.write_text(json.dumps({"version": IMPORT_CACHE_VERSION, "files": []}))
+
+    assert scan_codebase([src], cache_file) == {"numpy", "pandas"}
+    assert set(read_cache(cache_file)) == {str(src / "a.py"), str(src / "b.py")}